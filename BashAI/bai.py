@@ -1,17 +1,32 @@
 #!/usr/bin/env python3
 
+import asyncio
+import hashlib
 import subprocess
 import sys
 import os
 import json
 import logging
+import platform
+import orjson
+from textwrap import wrap
 from termcolor import colored
-import openai
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from halo import Halo
 
 MAX_LINE_WIDTH = 80
 
+# Output decorations
+SEPARATOR = colored("=" * MAX_LINE_WIDTH, "cyan")
+EXPLANATION_HEADER = colored("EXPLANATION:", "green")
+NOTES_HEADER = colored("\nNOTES:", "red")
+COMMAND_HEADER = colored("\nCOMMAND:", "green")
+
+# Cache configuration
+CACHE_DIR = os.path.expanduser('~/.cache/bai')
+RESPONSE_CACHE_DIR = os.path.join(CACHE_DIR, 'responses')
+
 # Logger configuration
 logging.basicConfig(filename='bai.log', level=logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -20,44 +35,68 @@ logger = logging.getLogger(__name__)
 spinner = Halo(text='Waiting for response...', spinner='dots12')
 
 def wrap_string(s, width):
-    lines = []
-    for paragraph in s.split("\n"):
-        while len(paragraph) > width:
-            pos = paragraph.rfind(' ', 0, width+1)
-            if pos <= 0:
-                pos = width
-            lines.append(paragraph[:pos])
-            paragraph = paragraph[pos+1:]
-        lines.append(paragraph)
-    return lines
+    # Only break on spaces and keep tabs, as commands rely on both
+    return [line
+            for paragraph in s.split("\n")
+            for line in (wrap(paragraph, width,
+                              break_on_hyphens=False,
+                              expand_tabs=False,
+                              replace_whitespace=False) or [''])]
+
+def read_os_release():
+    if hasattr(platform, 'freedesktop_os_release'):
+        return platform.freedesktop_os_release()
+    # Python < 3.10 has no os-release parser, so parse it by hand
+    os_release = {}
+    with open('/etc/os-release') as f:
+        for line in f:
+            key, sep, value = line.strip().partition('=')
+            if sep:
+                os_release[key] = value.strip('"')
+    return os_release
 
 def get_system_info():
     try:
-        # Command to get kernel version
-        kernel_version = subprocess.check_output('uname -r', shell=True).decode().strip()
-
-        # Command to get distribution name and version
-        os_release = subprocess.check_output('cat /etc/os-release', shell=True).decode()
+        # Kernel version
+        kernel_version = os.uname().release
 
-        # Parsing /etc/os-release for NAME and VERSION_ID
-        distro_name = None
-        distro_version = None
-        for line in os_release.split('\n'):
-            if line.startswith('NAME='):
-                distro_name = line.split('=')[1].strip('"')
-            if line.startswith('VERSION_ID='):
-                distro_version = line.split('=')[1].strip('"')
+        # Distribution name and version
+        os_release = read_os_release()
 
         return {
             "Kernel Version": kernel_version,
-            "Distro Name": distro_name,
-            "Distro Version": distro_version
+            "Distro Name": os_release.get('NAME'),
+            "Distro Version": os_release.get('VERSION_ID')
         }
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         logger.error(f"Error getting system info: {e}")
         print(f"Error getting system info: {e}")
         return None
 
+def get_response_cache_path(system_info, query):
+    key = f"{system_info['Distro Name']}|{system_info['Distro Version']}|{query}"
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(RESPONSE_CACHE_DIR, f"{digest}.json")
+
+def load_cached_response(cache_path):
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # Anything other than a response dict is treated as a miss
+    if not isinstance(cached, dict):
+        return None
+    return cached
+
+def save_cached_response(cache_path, result):
+    try:
+        os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(result, f)
+    except OSError as e:
+        logger.error(f"Error writing response cache: {e}")
+
 def run_command(command):
     run_command = input("Do you want to run this command? (y/n): ")
     if run_command.lower() in ('y', 'yes'):
@@ -85,34 +124,46 @@ def get_api_key():
         sys.exit(1)
     return api_key
 
-def call_openai_api(api_key, query, system_info):
-    openai.api_key = api_key
+async def call_openai_api(api_key, query, system_info):
     system_content = f"You are now an expert human to bash interpreter for {system_info['Distro Name']} {system_info['Distro Version']} that only responds with commands and does not use markup."
     user_content = f"You are now an expert human to bash interpreter for {system_info['Distro Name']} {system_info['Distro Version']}. I will tell you what I want to do and you will show me the commands to execute. Respond in JSON structured text with three keys only: 'Explanation': with an explanation and any relevant related switches or options, 'Command': the command/s or script, and 'Notes': any additional info. Do not offer any commentary or explanations outside of the JSON. Use tabs and newlines but do not use markup. My query is: {query}"
+    chunks = []
     try:
-        response = openai.ChatCompletion.create(
-            model = "gpt-3.5-turbo",
-            messages = [
-                {"role": "system", "content": f"{system_content}"},
-                {"role": "user", "content": f"{user_content}"}
-            ]
-        )
+        async with AsyncOpenAI(api_key=api_key) as client:
+            stream = await client.chat.completions.create(
+                model = "gpt-3.5-turbo",
+                messages = [
+                    {"role": "system", "content": f"{system_content}"},
+                    {"role": "user", "content": f"{user_content}"}
+                ],
+                response_format = {"type": "json_object"},
+                stream = True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                if not chunks:
+                    spinner.text = 'Receiving response...'
+                content = chunk.choices[0].delta.content
+                if content:
+                    chunks.append(content)
     except Exception as e:
+        spinner.stop()
         logger.error(f"Error calling OpenAI API: {e}")
         print(f"Error calling OpenAI API: {e}")
         sys.exit(1)
-    return response
+    return "".join(chunks)
 
-def process_response(response):
-    result = response.choices[0].message.content
+def process_response(result):
     logger.debug(f"Response from OpenAI: {result}")
+    # JSON mode can still yield invalid JSON if the reply is cut short
     try:
-        result = json.loads(result)
-    except json.JSONDecodeError:
+        return orjson.loads(result)
+    except orjson.JSONDecodeError:
+        spinner.stop()
         logger.error(f"Error decoding OpenAI response: {result}")
         print(f"Error decoding OpenAI response: {result}")
         sys.exit(1)
-    return result
 
 def print_response(result):
     explanation = result.get('Explanation', '')
@@ -123,37 +174,44 @@ def print_response(result):
         print("Error: Response from OpenAI is missing explanation or command.")
         sys.exit(1)
     print("\n")
-    print(colored("=" * 80, "cyan"))
-    print(colored("EXPLANATION:", "green"))
+    print(SEPARATOR)
+    print(EXPLANATION_HEADER)
     for line in wrap_string(explanation, MAX_LINE_WIDTH):
         print(colored(line, "white"))
-    print(colored("\nNOTES:", "red"))
+    print(NOTES_HEADER)
     notes_lines = wrap_string(notes, MAX_LINE_WIDTH)
     if notes_lines:
         print(colored("\n".join(notes_lines), "white"))
-    print(colored("=" * 80, "cyan"))
-    print(colored("\nCOMMAND:", "green"))
+    print(SEPARATOR)
+    print(COMMAND_HEADER)
     print(colored(command, "white"))
-    print(colored("=" * 80, "cyan"))
+    print(SEPARATOR)
     print("\n")
     return command
 
-def main():
+async def main():
     validate_arguments()
-    api_key = get_api_key()
 
     system_info = get_system_info()
     if not system_info:
         print("Unable to determine system information.")
         sys.exit(1)
 
-    spinner.start()
-    response = call_openai_api(api_key, sys.argv[1], system_info)
-    result = process_response(response)
-    spinner.stop()
+    # Answer repeated queries from the local cache
+    cache_path = get_response_cache_path(system_info, sys.argv[1])
+    result = load_cached_response(cache_path)
+    cached = result is not None
+    if not cached:
+        api_key = get_api_key()
+        spinner.start()
+        response = await call_openai_api(api_key, sys.argv[1], system_info)
+        result = process_response(response)
+        spinner.stop()
 
     command = print_response(result)
+    if not cached:
+        save_cached_response(cache_path, result)
     run_command(command)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,9 +1,6 @@
-from typing import Tuple
+import functools
+import os
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-import multiprocessing
 
 # Convective Heat Transfer Coefficients
 # Air - free convection 5 - 37    
@@ -20,96 +17,82 @@ H = 3.0  # cm
 TARGET_TEMP = 15.0 # °C
 CONV_HEAT_TRANS_COEF = 18.0  # W/m²K
 SIM_LEN = 250000.0  # seconds
-SIM_STEPS = 10000
+COOL_TOL = 0.01  # °C
 INIT_TEMP_L = 0.0 # °C
 INIT_TEMP_H = 3.0 # °C
 ROOM_TEMP_L = 3.0 # °C
 ROOM_TEMP_H = 18.0 # °C
+N_INIT = 100  # initial temperature samples
+N_ROOM = 100  # room temperature samples
 
 # Derived constants
 VOLUME = W * L * H  # in cm³
 MASS = VOLUME * DENS  # in g
 SURF_AREA = 2 * ((W * L + W * H + L * H) / 10000)  # in m², converted from cm²
+K_VALUE = CONV_HEAT_TRANS_COEF * SURF_AREA / (MASS * SPEC_HEAT_CAP)  # in 1/s
 
 
-def model(T: float, t: float, k: float, room_temp: float) -> float:
-    """
-    Model for Newton's law of cooling.
-
-    :param T: Current temperature.
-    :param t: Time.
-    :param k: Cooling constant.
-    :param room_temp: Room temperature.
-    :return: Rate of change of temperature.
-    """
-    return -k * (T - room_temp)
-
-def format_func(value, tick_number) -> str:
-    """Formats time values into appropriate units (days, hours, minutes)"""
-    if np.isnan(value):
-        return ""
-    days = int(value // 86400)
-    hours = int((value % 86400) // 3600)
-    minutes = int((value % 3600) // 60)
+@functools.lru_cache(maxsize=256)
+def format_time(seconds: int) -> str:
+    """Formats whole seconds into appropriate units (days, hours, minutes)"""
+    days, rem = divmod(seconds, 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes = rem // 60
     if days > 1:
         return f'{days}d {hours}h'
     else:
         return f'{hours}h {minutes}m'
 
-def sim_temp_change(init_temp: float,
-                    room_temp: float,) -> Tuple[float, float, float]:
-    """Simulate the time taken to cool to within 1 degree of room temperature
-    for the given initial and room temperatures."""
-    k_value = CONV_HEAT_TRANS_COEF * SURF_AREA / (MASS * SPEC_HEAT_CAP)
-    t = np.linspace(0, SIM_LEN, SIM_STEPS)
-    T = odeint(model, init_temp, t, args=(k_value, room_temp))
-    time_to_cool = None
-    for i in range(T.shape[0]):
-        if abs(T[i] - room_temp) <= 0.01:
-            time_to_cool = t[i]
-            break
-    if time_to_cool is None:
-        time_to_cool = np.nan  # replace None with NaN
-    return init_temp, room_temp, time_to_cool
-
-def perform_simulation(init_temps: np.ndarray,
-                       room_temps: np.ndarray) -> np.ndarray:
-    """Perform the simulation for the given initial and room temperatures."""
-    # Create a 2D grid of initial and room temperatures
-    # Use multiprocessing to simulate the time taken to cool to within 1 degree
-    # of room temperature for each combination of initial and room temperature
-    init_grid, room_grid = np.meshgrid(init_temps, room_temps)
-    pool = multiprocessing.Pool(processes=(multiprocessing.cpu_count() - 1))
-    # Create a list of tuples containing initial temps and room temps
-    temp_tuples = [
-        (init_temp, room_temp)
-        for init_temp, room_temp in zip(init_grid.ravel(), room_grid.ravel())
-    ]
-
-    # Use starmap to apply the sim_temp_change function to each tuple in
-    # parallel using the pool
-    results = pool.starmap(sim_temp_change, temp_tuples)
-
-    time_grid = np.zeros_like(init_grid)
-    for i, (init_temp, room_temp, time_to_cool) in enumerate(results):
-        row, col = np.unravel_index(i, init_grid.shape)
-        time_grid[row, col] = time_to_cool
-    return time_grid
+def format_func(value, tick_number) -> str:
+    """Formats time values into appropriate units (days, hours, minutes)"""
+    if np.isnan(value):
+        return ""
+    # Tick values repeat on every redraw, so the formatting is cached
+    return format_time(int(value))
+
+def perform_simulation(init_grid: np.ndarray,
+                       room_grid: np.ndarray) -> np.ndarray:
+    """Perform the simulation for the given grids of initial and room
+    temperatures, which may be sparse."""
+    # Newton's law of cooling has the closed-form solution
+    # T(t) = room_temp + (init_temp - room_temp) * exp(-k * t), so the time
+    # taken to get within COOL_TOL of room temperature is
+    # ln(|init_temp - room_temp| / COOL_TOL) / k, or 0 if already within it
+    diff = np.abs(init_grid - room_grid)
+    time_grid = np.log(np.maximum(diff, COOL_TOL) / COOL_TOL) / K_VALUE
+    # Cells that would not cool within the simulated time are left blank
+    return np.where(time_grid > SIM_LEN, np.nan, time_grid)
 
 
 def plot_results(init_grid: np.ndarray,
                  room_grid: np.ndarray,
-                 time_grid: np.ndarray) -> None:
-    """Plot the simulation results."""
-    # Create a new figure for display
-    fig = plt.figure(figsize=(12, 10))
-    ax = fig.add_subplot(211,
+                 time_grid: np.ndarray,
+                 show: bool = True) -> None:
+    """Plot the simulation results, displaying them only if show is set."""
+    # matplotlib is slow to import, so only load it once there is something
+    # to plot
+    import matplotlib
+    if not show:
+        # Only the PNGs are needed, so skip loading a GUI backend
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as ticker
+
+    time_formatter = ticker.FuncFormatter(format_func)
+
+    # Expand sparse grids to full views for plotting without copying them
+    init_grid, room_grid, time_grid = np.broadcast_arrays(init_grid,
+                                                          room_grid,
+                                                          time_grid)
+
+    # Draw the surface plot
+    fig = plt.figure()
+    ax = fig.add_subplot(111,
                          projection='3d',
                          proj_type='ortho',
                          azim=-120,
                          elev=30,
                          box_aspect=(1, 1, 1))
-    # Draw the surface plot
     ax.set_xlim(INIT_TEMP_L, INIT_TEMP_H)
     ax.set_ylim(ROOM_TEMP_L, ROOM_TEMP_H)
     ax.plot_surface(init_grid,
@@ -121,104 +104,65 @@ def plot_results(init_grid: np.ndarray,
     ax.set_xlabel('Initial Temperature (°C)')
     ax.set_ylabel('Room Temperature (°C)')
     ax.set_zlabel('Time to Reach Room Temp')
-    ax.zaxis.set_major_formatter(ticker.FuncFormatter(format_func))
-
-    # Save the surface plot
-    fig2 = plt.figure()
-    ax2 = fig2.add_subplot(111,
-                           projection='3d',
-                           proj_type='ortho',
-                           azim=-120,
-                           elev=30,
-                           box_aspect=(1, 1, 1))
-    ax2.plot_surface(init_grid,
-                     room_grid,
-                     time_grid,
-                     cmap='coolwarm',
-                     linewidth=0,
-                     antialiased=True)
-    ax2.set_xlabel('Initial Temperature (°C)')
-    ax2.set_ylabel('Room Temperature (°C)')
-    ax2.set_zlabel('Time to Reach Room Temp')
-    ax2.zaxis.set_major_formatter(ticker.FuncFormatter(format_func))
-    fig2.savefig("3d_plot.png")
-    plt.close(fig2)
+    ax.zaxis.set_major_formatter(time_formatter)
+    fig.savefig("3d_plot.png")
 
-    min_time = np.min(time_grid)
-    max_time = np.max(time_grid)
+    # Cells that do not cool within SIM_LEN are NaN
+    min_time = np.nanmin(time_grid)
+    max_time = np.nanmax(time_grid)
 
     # Draw the contour plot
-    ax3 = fig.add_subplot(212)
-    ax3.set_xlim(INIT_TEMP_L, INIT_TEMP_H)
+    fig2 = plt.figure()
+    ax2 = fig2.add_subplot(111)
+    ax2.set_xlim(INIT_TEMP_L, INIT_TEMP_H)
     contour_levels = np.linspace(min_time, max_time, 16)
 
-    contour_fill = ax3.contourf(init_grid,
-                                room_grid,
-                                time_grid,
-                                levels=contour_levels,
-                                cmap='coolwarm',
-                                vmin=min_time,
-                                vmax=max_time)
-    contour_lines = ax3.contour(init_grid,
+    # The grid is rectilinear, so draw the fill as a mesh and only trace
+    # contours for the labelled lines
+    contour_fill = ax2.pcolormesh(init_grid,
+                                  room_grid,
+                                  time_grid,
+                                  cmap='coolwarm',
+                                  vmin=min_time,
+                                  vmax=max_time,
+                                  shading='auto')
+    contour_lines = ax2.contour(init_grid,
                                 room_grid,
                                 time_grid,
                                 levels=contour_levels,
                                 colors='k')
-    ax3.set_xlabel('Initial Temperature (°C)')
-    ax3.set_ylabel('Room Temperature (°C)')
-    ax3.clabel(contour_lines,
-               inline=1,
-               fontsize=10,
-               fmt=ticker.FuncFormatter(format_func))
-    colorbar = fig.colorbar(contour_fill,
-                            ax=ax3,
-                            format=ticker.FuncFormatter(format_func))
-
-    # Save the contour plot
-    fig4 = plt.figure()
-    ax4 = fig4.add_subplot(111)
-    ax4.set_xlim(INIT_TEMP_L, INIT_TEMP_H)
-    contour_fill_2 = ax4.contourf(init_grid,
-                                room_grid,
-                                time_grid,
-                                levels=contour_levels,
-                                cmap='coolwarm',
-                                vmin=min_time,
-                                vmax=max_time)
-    contour_lines_2 = ax4.contour(init_grid,
-                                  room_grid,
-                                  time_grid,
-                                  levels=contour_levels,
-                                  colors='k')
-    ax4.set_xlabel('Initial Temperature (°C)')
-    ax4.set_ylabel('Room Temperature (°C)')
-    ax4.clabel(contour_lines_2,
+    ax2.set_xlabel('Initial Temperature (°C)')
+    ax2.set_ylabel('Room Temperature (°C)')
+    ax2.clabel(contour_lines,
                inline=1,
                fontsize=10,
-               fmt=ticker.FuncFormatter(format_func))
-    colorbar_2 = fig4.colorbar(contour_fill_2,
-                               ax=ax4,
-                               format=ticker.FuncFormatter(format_func))
-    fig4.savefig("contour_plot.png")
-    plt.close(fig4)
-
-    fig.tight_layout()
-    plt.show()
+               fmt=time_formatter)
+    colorbar = fig2.colorbar(contour_fill,
+                             ax=ax2,
+                             format=time_formatter)
+    fig2.savefig("contour_plot.png")
 
+    if show:
+        plt.show()
 
 
 def main() -> None:
     """Main function for the program."""
-    # Create a 2D grid of initial and room temperatures
-    init_temps = np.linspace(INIT_TEMP_L, INIT_TEMP_H, 100)
-    room_temps = np.linspace(ROOM_TEMP_L, ROOM_TEMP_H, 100)
-    init_grid, room_grid = np.meshgrid(init_temps, room_temps)
+    # Create a 2D grid of initial and room temperatures. The results are only
+    # plotted, so single precision is plenty and carries through to time_grid
+    init_temps = np.linspace(INIT_TEMP_L, INIT_TEMP_H, N_INIT,
+                             dtype=np.float32)
+    room_temps = np.linspace(ROOM_TEMP_L, ROOM_TEMP_H, N_ROOM,
+                             dtype=np.float32)
+    init_grid, room_grid = np.meshgrid(init_temps, room_temps, sparse=True)
 
     # Perform the simulation
-    time_grid = perform_simulation(init_temps, room_temps)
+    time_grid = perform_simulation(init_grid, room_grid)
 
     # Plot the simulation results
-    plot_results(init_grid, room_grid, time_grid)
+    headless = (os.environ.get("THAWMASTER_HEADLESS", "").lower()
+                in ("1", "true", "yes"))
+    plot_results(init_grid, room_grid, time_grid, show=not headless)
 
 
 if __name__ == "__main__":